@@ -16,10 +16,20 @@
 # The 'operand_kinds' dict of spirv.core.grammar.json contains all supported
 # SPIR-V enum classes.
 
-import itertools
+import hashlib
+import os
+import pickle
 import re
 import requests
 import textwrap
+import threading
+
+try:
+  # Use requests-cache if available so that repeated invocations do not need
+  # to download the (large) SPIR-V specs again.
+  import requests_cache
+except ImportError:
+  requests_cache = None
 
 SPIRV_HTML_SPEC_URL = 'https://www.khronos.org/registry/spir-v/specs/unified1/SPIRV.html'
 SPIRV_JSON_SPEC_URL = 'https://raw.githubusercontent.com/KhronosGroup/SPIRV-Headers/master/include/spirv/unified1/spirv.core.grammar.json'
@@ -29,6 +39,117 @@ AUTOGEN_ENUM_SECTION_MARKER = 'enum section. Generated from SPIR-V spec; DO NOT
 AUTOGEN_OPCODE_SECTION_MARKER = (
     'opcode section. Generated from SPIR-V spec; DO NOT MODIFY!')
 
+# Patterns for extracting information from existing TableGen definitions
+OPCODE_DEF_RE = re.compile(r'def SPV_OC_\w+')
+ENUM_ATTR_DEF_RE = re.compile(r'def SPV_\w+Attr')
+# Splits an op definition into the sections that may be manually specified.
+# The base class template arguments are scanned up to their closing '>',
+# allowing one level of nested templates; the traits list is optional. Base
+# classes not ending with 'Op' leave inst_category unset. The description,
+# arguments, and results sections are all optional; whatever follows the last
+# of them is kept as extra definitions.
+OP_DEF_PARTS_RE = re.compile(
+    r'def SPV_(?P<opname>\w+)Op\s*:\s*'
+    r'SPV_(?:(?P<inst_category>\w*Op)|\w+)<'
+    r'\s*"[^"]*"(?P<category_args>(?:[^\[<>]|<[^<>]*>)*)'
+    r'(?:\[(?P<traits>[^\]]*)\])?[^>]*>'
+    r'(?:.*?let description = \[\{\n(?P<description>.*?)\}\];\n)?'
+    r'(?:.*?  let arguments = \(ins(?P<arguments>.*?)\);\n)?'
+    r'(?:.*?  let results = \(outs(?P<results>.*?)\);\n)?'
+    r'(?P<extras>.*)', re.DOTALL)
+NON_WORD_RE = re.compile(r'\W+')
+
+SPIRV_SPEC_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'mlir-spirv-gen')
+# Bump this whenever the doc extraction in get_spirv_doc_from_html_spec
+# changes to invalidate cached results
+DOCS_CACHE_VERSION = 1
+# Bump this whenever extract_td_op_info changes to invalidate cached results
+OP_INFO_CACHE_VERSION = 3
+
+
+http_session = None
+http_session_lock = threading.Lock()
+
+
+def get_http_session():
+  """Returns the session to use for fetching SPIR-V specs.
+
+  The session is created on first use. If requests-cache is installed,
+  responses are cached in a SQLite database under SPIRV_SPEC_CACHE_DIR and
+  revalidated with the server after a day. Otherwise, falls back to plain
+  requests.
+  """
+  global http_session
+  with http_session_lock:
+    if http_session is None:
+      if requests_cache is None:
+        http_session = requests.Session()
+      else:
+        os.makedirs(SPIRV_SPEC_CACHE_DIR, exist_ok=True)
+        http_session = requests_cache.CachedSession(
+            os.path.join(SPIRV_SPEC_CACHE_DIR, 'spirv_spec_cache'),
+            backend='sqlite',
+            expire_after=24 * 3600,
+            cache_control=True)
+    return http_session
+
+
+def load_cached_object(filename, key):
+  """Loads an object pickled under SPIRV_SPEC_CACHE_DIR.
+
+  Arguments:
+    - filename: the name of the cache file
+    - key: the key the object must have been stored with
+
+  Returns:
+    - The cached object if present and stored with the given key; None
+      otherwise.
+  """
+  if not key:
+    return None
+  try:
+    with open(os.path.join(SPIRV_SPEC_CACHE_DIR, filename), 'rb') as f:
+      cached_key, obj = pickle.load(f)
+  except Exception:
+    return None
+  return obj if cached_key == key else None
+
+
+def store_cached_object(filename, key, obj):
+  """Pickles an object with the given key under SPIRV_SPEC_CACHE_DIR.
+
+  The file is written to a temporary location first and then atomically moved
+  in place so that concurrent or interrupted runs never see a partial file.
+
+  Arguments:
+    - filename: the name of the cache file
+    - key: the key to store the object with
+    - obj: the object to pickle
+  """
+  if not key:
+    return
+  os.makedirs(SPIRV_SPEC_CACHE_DIR, exist_ok=True)
+  path = os.path.join(SPIRV_SPEC_CACHE_DIR, filename)
+  tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+  with open(tmp_path, 'wb') as f:
+    pickle.dump((key, obj), f, pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, path)
+
+
+def get_html_parser():
+  """Returns the name of the HTML parser to use with BeautifulSoup.
+
+  Prefers the C-based lxml parser, which is much faster than the pure-Python
+  html.parser on the multi-megabyte spec, if bs4 can use it.
+  """
+  from bs4 import BeautifulSoup, FeatureNotFound
+  try:
+    BeautifulSoup('<html></html>', 'lxml')
+    return 'lxml'
+  except FeatureNotFound:
+    return 'html.parser'
+
 
 def get_spirv_doc_from_html_spec():
   """Extracts instruction documentation from SPIR-V HTML spec.
@@ -36,11 +157,23 @@ def get_spirv_doc_from_html_spec():
   Returns:
     - A dict mapping from instruction opcode to documentation.
   """
-  response = requests.get(SPIRV_HTML_SPEC_URL)
+  response = get_http_session().get(SPIRV_HTML_SPEC_URL)
+
+  html_parser = get_html_parser()
+
+  # Reuse the previously extracted documentation if the spec is unchanged.
+  cache_key = response.headers.get('ETag') or \
+      response.headers.get('Last-Modified')
+  if cache_key:
+    cache_key = (DOCS_CACHE_VERSION, html_parser, cache_key)
+  doc = load_cached_object('docs.pkl', cache_key)
+  if doc is not None:
+    return doc
+
   spec = response.content
 
   from bs4 import BeautifulSoup
-  spirv = BeautifulSoup(spec, 'html.parser')
+  spirv = BeautifulSoup(spec, html_parser)
 
   section_anchor = spirv.find('h3', {'id': '_a_id_instructions_a_instructions'})
 
@@ -53,6 +186,7 @@ def get_spirv_doc_from_html_spec():
       # Ignore the first line, which is just the opname.
       doc[opname] = inst_html.text.split('\n', 1)[1].strip()
 
+  store_cached_object('docs.pkl', cache_key, doc)
   return doc
 
 
@@ -63,41 +197,38 @@ def get_spirv_grammar_from_json_spec():
     - A list containing all operand kinds' grammar
     - A list containing all instructions' grammar
   """
-  response = requests.get(SPIRV_JSON_SPEC_URL)
+  response = get_http_session().get(SPIRV_JSON_SPEC_URL)
   spec = response.content
 
-  import json
+  # Prefer the much faster orjson for decoding the grammar if available.
+  try:
+    import orjson as json
+  except ImportError:
+    import json
   spirv = json.loads(spec)
 
   return spirv['operand_kinds'], spirv['instructions']
 
 
-def split_list_into_sublists(items, offset):
-  """Split the list of items into multiple sublists.
+def wrap_case_list(items):
+  """Joins the list of items into multiple comma-separated lines.
 
-  This is to make sure the string composed from each sublist won't exceed
-  80 characters.
+  Each line is indented by 6 spaces and holds as many items as fit in 80
+  characters, counting ', ' after every item.
 
   Arguments:
     - items: a list of strings
-    - offset: the offset in calculating each sublist's length
   """
-  chuncks = []
-  chunk = []
-  chunk_len = 0
-
-  for item in items:
-    chunk_len += len(item) + 2
-    if chunk_len > 80:
-      chuncks.append(chunk)
-      chunk = []
-      chunk_len = len(item) + 2
-    chunk.append(item)
-
-  if len(chunk) != 0:
-    chuncks.append(chunk)
-
-  return chuncks
+  # The trailing comma and the 6-space indentation are counted in the width
+  # given to textwrap, hence the 80 + 6 - 1.
+  lines = textwrap.wrap(
+      ', '.join(items) + ',',
+      width=85,
+      initial_indent=' ' * 6,
+      subsequent_indent=' ' * 6,
+      break_long_words=False,
+      break_on_hyphens=False)
+  return '\n'.join(lines)[:-1]
 
 
 def uniquify_enum_cases(lst):
@@ -112,24 +243,17 @@ def uniquify_enum_cases(lst):
      value and, for each value, uniqued according to symbol.
      original list,
   """
-  cases = lst
-  uniqued_cases = []
+  # Keep one case per value. Visiting cases in symbol order means the first
+  # one seen for a value is the "smallest", which is typically the symbol
+  # without extension suffix. But we have special cases that we want to fix.
+  uniqued_cases = {}
+  for case in sorted(lst, key=lambda x: x[0]):
+    kept = uniqued_cases.setdefault(case[1], case)
+    if kept[0] == 'HlslSemanticGOOGLE':
+      uniqued_cases[case[1]] = case
 
-  # First sort according to the value
-  cases.sort(key=lambda x: x[1])
-
-  # Then group them according to the value
-  for _, groups in itertools.groupby(cases, key=lambda x: x[1]):
-    # For each value, sort according to the enumerant symbol.
-    sorted_group = sorted(groups, key=lambda x: x[0])
-    # Keep the "smallest" case, which is typically the symbol without extension
-    # suffix. But we have special cases that we want to fix.
-    case = sorted_group[0]
-    if case[0] == 'HlslSemanticGOOGLE':
-      case = sorted_group[1]
-    uniqued_cases.append(case)
-
-  return uniqued_cases
+  # Sort according to the value
+  return sorted(uniqued_cases.values(), key=lambda x: x[1])
 
 
 def gen_operand_kind_enum_attr(operand_kind):
@@ -161,30 +285,16 @@ def gen_operand_kind_enum_attr(operand_kind):
   max_len = max([len(symbol) for (symbol, _) in kind_cases])
 
   # Generate the definition for each enum case
-  fmt_str = 'def SPV_{acronym}_{case} {colon:>{offset}} '\
-            '{category}EnumAttrCase<"{symbol}", {value}>;'
-  case_defs = [
-      fmt_str.format(
-          category=kind_category,
-          acronym=kind_acronym,
-          case=case[0],
-          symbol=get_case_symbol(kind_name, case[0]),
-          value=case[1],
-          colon=':',
-          offset=(max_len + 1 - len(case[0]))) for case in kind_cases
-  ]
-  case_defs = '\n'.join(case_defs)
+  case_defs = '\n'.join(
+      f'def SPV_{kind_acronym}_{case.ljust(max_len)} : '
+      f'{kind_category}EnumAttrCase<"{get_case_symbol(kind_name, case)}", '
+      f'{value}>;' for (case, value) in kind_cases)
 
   # Generate the list of enum case names
-  fmt_str = 'SPV_{acronym}_{symbol}';
-  case_names = [fmt_str.format(acronym=kind_acronym,symbol=case[0])
-                for case in kind_cases]
+  case_names = [f'SPV_{kind_acronym}_{case}' for (case, _) in kind_cases]
 
-  # Split them into sublists and concatenate into multiple lines
-  case_names = split_list_into_sublists(case_names, 6)
-  case_names = ['{:6}'.format('') + ', '.join(sublist)
-                for sublist in case_names]
-  case_names = ',\n'.join(case_names)
+  # Concatenate them into multiple lines
+  case_names = wrap_case_list(case_names)
 
   # Generate the enum attribute definition
   enum_attr = 'def SPV_{name}Attr :\n    '\
@@ -202,27 +312,14 @@ def gen_opcode(instructions):
     - A string containing the TableGen SPV_OpCode definition
   """
 
-  max_len = max([len(inst['opname']) for inst in instructions])
-  def_fmt_str = 'def SPV_OC_{name} {colon:>{offset}} '\
-            'I32EnumAttrCase<"{name}", {value}>;'
-  opcode_defs = [
-      def_fmt_str.format(
-          name=inst['opname'],
-          value=inst['opcode'],
-          colon=':',
-          offset=(max_len + 1 - len(inst['opname']))) for inst in instructions
-  ]
-  opcode_str = '\n'.join(opcode_defs)
-
-  decl_fmt_str = 'SPV_OC_{name}'
-  opcode_list = [
-      decl_fmt_str.format(name=inst['opname']) for inst in instructions
-  ]
-  opcode_list = split_list_into_sublists(opcode_list, 6)
-  opcode_list = [
-      '{:6}'.format('') + ', '.join(sublist) for sublist in opcode_list
-  ]
-  opcode_list = ',\n'.join(opcode_list)
+  max_len = max(len(inst['opname']) for inst in instructions)
+  opcode_str = '\n'.join(
+      f'def SPV_OC_{inst["opname"].ljust(max_len)} : '
+      f'I32EnumAttrCase<"{inst["opname"]}", {inst["opcode"]}>;'
+      for inst in instructions)
+
+  opcode_list = wrap_case_list(
+      f'SPV_OC_{inst["opname"]}' for inst in instructions)
   enum_attr = 'def SPV_OpcodeAttr :\n'\
               '    I32EnumAttr<"{name}", "valid SPIR-V instructions", [\n'\
               '{lst}\n'\
@@ -232,29 +329,28 @@ def gen_opcode(instructions):
   return opcode_str + '\n\n' + enum_attr
 
 
-def update_td_opcodes(path, instructions, filter_list):
+def update_td_opcodes(content, instructions, filter_list):
   """Updates SPIRBase.td with new generated opcode cases.
 
   Arguments:
-    - path: the path to SPIRBase.td
+    - content: the content of SPIRBase.td
     - instructions: a list containing all SPIR-V instructions' grammar
     - filter_list: a list containing new opnames to add
-  """
-
-  with open(path, 'r') as f:
-    content = f.read()
 
+  Returns:
+    - A string containing the updated content of SPIRBase.td
+  """
   content = content.split(AUTOGEN_OPCODE_SECTION_MARKER)
   assert len(content) == 3
 
   # Extend opcode list with existing list
-  existing_opcodes = [k[11:] for k in re.findall('def SPV_OC_\w+', content[1])]
+  existing_opcodes = [k[11:] for k in OPCODE_DEF_RE.findall(content[1])]
   filter_list.extend(existing_opcodes)
-  filter_list = list(set(filter_list))
+  filter_list = set(filter_list)
 
   # Generate the opcode for all instructions in SPIR-V
-  filter_instrs = list(
-      filter(lambda inst: (inst['opname'] in filter_list), instructions))
+  filter_instrs = [
+      inst for inst in instructions if inst['opname'] in filter_list]
   # Sort instruction based on opcode
   filter_instrs.sort(key=lambda inst: inst['opcode'])
   opcode = gen_opcode(filter_instrs)
@@ -264,28 +360,28 @@ def update_td_opcodes(path, instructions, filter_list):
         opcode + '\n\n// End ' + AUTOGEN_OPCODE_SECTION_MARKER \
         + content[2]
 
-  with open(path, 'w') as f:
-    f.write(content)
+  return content
 
 
-def update_td_enum_attrs(path, operand_kinds, filter_list):
+def update_td_enum_attrs(content, operand_kinds, filter_list):
   """Updates SPIRBase.td with new generated enum definitions.
 
   Arguments:
-    - path: the path to SPIRBase.td
+    - content: the content of SPIRBase.td
     - operand_kinds: a list containing all operand kinds' grammar
     - filter_list: a list containing new enums to add
-  """
-  with open(path, 'r') as f:
-    content = f.read()
 
+  Returns:
+    - A string containing the updated content of SPIRBase.td
+  """
   content = content.split(AUTOGEN_ENUM_SECTION_MARKER)
   assert len(content) == 3
 
   # Extend filter list with existing enum definitions
   existing_kinds = [
-      k[8:-4] for k in re.findall('def SPV_\w+Attr', content[1])]
+      k[8:-4] for k in ENUM_ATTR_DEF_RE.findall(content[1])]
   filter_list.extend(existing_kinds)
+  filter_list = set(filter_list)
 
   # Generate definitions for all enums in filter list
   defs = [gen_operand_kind_enum_attr(kind)
@@ -303,13 +399,12 @@ def update_td_enum_attrs(path, operand_kinds, filter_list):
       '\n\n'.join(defs) + "\n\n// End " + AUTOGEN_ENUM_SECTION_MARKER  \
       + content[2];
 
-  with open(path, 'w') as f:
-    f.write(content)
+  return content
 
 
 def snake_casify(name):
   """Turns the given name to follow snake_case convention."""
-  name = re.sub('\W+', '', name).split()
+  name = NON_WORD_RE.sub('', name).split()
   name = [s.lower() for s in name]
   return '_'.join(name)
 
@@ -483,65 +578,6 @@ def get_op_definition(instruction, doc, existing_info):
       extras=existing_info.get('extras', ''))
 
 
-def get_string_between(base, start, end):
-  """Extracts a substring with a specified start and end from a string.
-
-  Arguments:
-    - base: string to extract from.
-    - start: string to use as the start of the substring.
-    - end: string to use as the end of the substring.
-
-  Returns:
-    - The substring if found
-    - The part of the base after end of the substring. Is the base string itself
-      if the substring wasnt found.
-  """
-  split = base.split(start, 1)
-  if len(split) == 2:
-    rest = split[1].split(end, 1)
-    assert len(rest) == 2, \
-           'cannot find end "{end}" while extracting substring '\
-           'starting with {start}'.format(start=start, end=end)
-    return rest[0].rstrip(end), rest[1]
-  return '', split[0]
-
-
-def get_string_between_nested(base, start, end):
-  """Extracts a substring with a nested start and end from a string.
-
-  Arguments:
-    - base: string to extract from.
-    - start: string to use as the start of the substring.
-    - end: string to use as the end of the substring.
-
-  Returns:
-    - The substring if found
-    - The part of the base after end of the substring. Is the base string itself
-      if the substring wasnt found.
-  """
-  split = base.split(start, 1)
-  if len(split) == 2:
-    # Handle nesting delimiters
-    rest = split[1]
-    unmatched_start = 1
-    index = 0
-    while unmatched_start > 0 and index < len(rest):
-      if rest[index:].startswith(end):
-        unmatched_start -= 1
-        index += len(end)
-      elif rest[index:].startswith(start):
-        unmatched_start += 1
-        index += len(start)
-      else:
-        index += 1
-
-    assert index < len(rest), \
-           'cannot find end "{end}" while extracting substring '\
-           'starting with "{start}"'.format(start=start, end=end)
-    return rest[:index - len(end)].rstrip(end), rest[index:]
-  return '', split[0]
-
-
 def extract_td_op_info(op_def):
   """Extracts potentially manually specified sections in op's definition.
 
@@ -551,50 +587,24 @@ def extract_td_op_info(op_def):
   Returns:
     - A dict containing potential manually specified sections
   """
-  # Get opname
-  opname = [o[8:-2] for o in re.findall('def SPV_\w+Op', op_def)]
-  assert len(opname) == 1, 'more than one ops in the same section!'
-  opname = opname[0]
-
-  # Get instruction category
-  inst_category = [
-      o[4:] for o in re.findall('SPV_\w+Op',
-                                op_def.split(':', 1)[1])
-  ]
-  assert len(inst_category) <= 1, 'more than one ops in the same section!'
-  inst_category = inst_category[0] if len(inst_category) == 1 else 'Op'
-
-  # Get category_args
-  op_tmpl_params = get_string_between_nested(op_def, '<', '>')[0]
-  opstringname, rest = get_string_between(op_tmpl_params, '"', '"')
-  category_args = rest.split('[', 1)[0]
-
-  # Get traits
-  traits, _ = get_string_between(rest, '[', ']')
-
-  # Get description
-  description, rest = get_string_between(op_def, 'let description = [{\n',
-                                         '}];\n')
-
-  # Get arguments
-  args, rest = get_string_between(rest, '  let arguments = (ins', ');\n')
-
-  # Get results
-  results, rest = get_string_between(rest, '  let results = (outs', ');\n')
-
-  extras = rest.strip(' }\n')
+  match = OP_DEF_PARTS_RE.search(op_def)
+  assert match is not None, 'cannot find op definition in section!'
+  info = match.groupdict(default='')
+
+  inst_category = info['inst_category'] or 'Op'
+  extras = info['extras'].strip(' }\n')
   if extras:
     extras = '\n  {}\n'.format(extras)
 
   return {
       # Prefix with 'Op' to make it consistent with SPIR-V spec
-      'opname': 'Op{}'.format(opname),
+      'opname': 'Op{}'.format(info['opname']),
       'inst_category': inst_category,
-      'category_args': category_args,
-      'traits': traits,
-      'description': description,
-      'arguments': args,
-      'results': results,
+      'category_args': info['category_args'],
+      'traits': info['traits'],
+      'description': info['description'],
+      'arguments': info['arguments'],
+      'results': info['results'],
       'extras': extras
   }
 
@@ -621,32 +631,44 @@ def update_td_op_definitions(path, instructions, docs, filter_list,
   footer = ops[-1]
   ops = ops[1:-1]
 
+  # Extraction results from previous runs are cached keyed by the SHA-1 of the
+  # op definition, so only new or modified ops need to be parsed again.
+  cache_file = 'op_info_{}.pkl'.format(os.path.basename(path))
+  cached_infos = load_cached_object(cache_file, OP_INFO_CACHE_VERSION) or {}
+  op_infos = {}  # Map from op definition hash to its extracted info
+
   # For each existing op, extract the manually-written sections out to retain
   # them when re-generating the ops. Also append the existing ops to filter
   # list.
   name_op_map = {}  # Map from opname to its existing ODS definition
   op_info_dict = {}
   for op in ops:
-    info_dict = extract_td_op_info(op)
+    op_hash = hashlib.sha1(op.encode('utf-8')).hexdigest()
+    info_dict = cached_infos.get(op_hash)
+    if info_dict is None:
+      info_dict = extract_td_op_info(op)
+    op_infos[op_hash] = info_dict
     opname = info_dict['opname']
     name_op_map[opname] = op
     op_info_dict[opname] = info_dict
     filter_list.append(opname)
-  filter_list = sorted(list(set(filter_list)))
+  filter_list = sorted(set(filter_list))
+  store_cached_object(cache_file, OP_INFO_CACHE_VERSION, op_infos)
+
+  inst_map = {inst['opname']: inst for inst in instructions}
 
   op_defs = []
   for opname in filter_list:
     # Find the grammar spec for this op
-    try:
-      instruction = next(
-          inst for inst in instructions if inst['opname'] == opname)
+    instruction = inst_map.get(opname)
+    if instruction is None:
+      # This is an op added by us; use the existing ODS definition.
+      op_defs.append(name_op_map[opname])
+    else:
       op_defs.append(
           get_op_definition(
               instruction, docs[opname],
               op_info_dict.get(opname, {'inst_category': inst_category})))
-    except StopIteration:
-      # This is an op added by us; use the existing ODS definition.
-      op_defs.append(name_op_map[opname])
 
   # Substitute the old op definitions
   op_defs = [header] + op_defs + [footer]
@@ -705,23 +727,36 @@ if __name__ == '__main__':
 
   args = cli_parser.parse_args()
 
-  operand_kinds, instructions = get_spirv_grammar_from_json_spec()
+  # Fetch the JSON and HTML specs concurrently; the HTML spec is only needed
+  # for defining new ops.
+  from concurrent.futures import ThreadPoolExecutor
+  with ThreadPoolExecutor(max_workers=2) as executor:
+    grammar_future = executor.submit(get_spirv_grammar_from_json_spec)
+    if args.new_inst is not None:
+      docs_future = executor.submit(get_spirv_doc_from_html_spec)
+    operand_kinds, instructions = grammar_future.result()
 
-  # Define new enum attr
-  if args.new_enum is not None:
+  if args.new_enum is not None or args.new_opcodes is not None:
     assert args.base_td_path is not None
-    filter_list = [args.new_enum] if args.new_enum else []
-    update_td_enum_attrs(args.base_td_path, operand_kinds, filter_list)
+    with open(args.base_td_path, 'r') as f:
+      content = f.read()
 
-  # Define new opcode
-  if args.new_opcodes is not None:
-    assert args.base_td_path is not None
-    update_td_opcodes(args.base_td_path, instructions, args.new_opcodes)
+    # Define new enum attr
+    if args.new_enum is not None:
+      filter_list = [args.new_enum] if args.new_enum else []
+      content = update_td_enum_attrs(content, operand_kinds, filter_list)
+
+    # Define new opcode
+    if args.new_opcodes is not None:
+      content = update_td_opcodes(content, instructions, args.new_opcodes)
+
+    with open(args.base_td_path, 'w') as f:
+      f.write(content)
 
   # Define new op
   if args.new_inst is not None:
     assert args.op_td_path is not None
-    docs = get_spirv_doc_from_html_spec()
+    docs = docs_future.result()
     update_td_op_definitions(args.op_td_path, instructions, docs, args.new_inst,
                              args.inst_category)
     print('Done. Note that this script just generates a template; ', end='')